@@ -4,35 +4,101 @@
 import os
 import sys
 import io
-import time
 import mmap
 import struct
+import hashlib
+import threading
+import time
+import multiprocessing
 import traceback
+from itertools import islice
+from collections import deque, OrderedDict
 from pathlib import Path
 from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
 from PySide6 import QtCore, QtWidgets, QtGui
 
 # -------------------- 常量 & 預設 --------------------
 PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+IEND_CHUNK = b"\x00\x00\x00\x00IEND\xaeB`\x82"  # 長度 0 + 類型 + 固定的 CRC
 DEFAULT_EXTS = [
     ".mod",
 ]
-SCAN_INTERVAL_SEC = 1.5  # 監看輪詢間隔
+_SEEN_BY_PATH = os.name == "nt"  # WatchWorker._seen 的鍵：Windows 用路徑，其他平台用 (st_dev, st_ino)
+SETTLE_SEC = 0.3  # 收到變更通知後稍候：合併連續事件，並等檔案寫完
+POLL_SEC = 2.0    # 無法加入 QFileSystemWatcher 的路徑改以此間隔輪詢
 
-# -------------------- 圖像封包（記憶體，不落地） --------------------
+# -------------------- 圖像封包（不落地；位元組掃描結果延遲自來源檔讀取） --------------------
 @dataclass
 class ImageBlob:
     source_file: str
     source_path: str
     label: str
-    png_bytes: bytes
     width: int = 0
     height: int = 0
-    def qpixmap(self) -> QtGui.QPixmap:
-        pix = QtGui.QPixmap(); pix.loadFromData(self.png_bytes, "PNG"); return pix
+    offset: int = 0             # PNG 在來源檔內的位置（位元組掃描）
+    length: int = 0
+    data: bytes | None = None   # 已在記憶體的 PNG（UnityPy 貼圖）；有值時不讀來源檔
+    digest: bytes = b""         # 內容雜湊（工作者執行緒計算），用於跨檔去重
+    @property
+    def png_bytes(self) -> bytes:
+        if self.data is not None: return self.data
+        try:
+            with open(self.source_path, "rb") as f:
+                f.seek(self.offset); raw = f.read(self.length)
+        except OSError:
+            return b""
+        # 來源檔已被改寫/截斷時回傳空位元組，交由呼叫端視為失敗。
+        # 同一位置可能換成另一張 PNG：有雜湊（_prepare 算出）就比對內容，確保與縮圖/標籤是同一張
+        if len(raw) != self.length or not raw.startswith(PNG_MAGIC): return b""
+        if self.digest and hashlib.blake2b(raw, digest_size=16).digest() != self.digest: return b""
+        return raw
 
 # -------------------- 抽取：位元組掃描 PNG --------------------
+HS_WINDOW = 64 * 1024 * 1024  # hyperscan 單次掃描視窗（其長度參數為 32 位元）
+_PNG_DB = None                # hyperscan 資料庫快取；False 表示不可用
+
+def _madvise(mm, *names: str):
+    """對 mmap 下 madvise 提示；Windows 等不支援的平台直接略過。"""
+    for name in names:
+        advice = getattr(mmap, name, None)
+        if advice is None: continue
+        try: mm.madvise(advice)
+        except (AttributeError, OSError): pass
+
+def _png_magic_db():
+    """編譯 PNG 魔數的 hyperscan 資料庫（選用）；未安裝時回傳 None，改用 mm.find。"""
+    global _PNG_DB
+    if _PNG_DB is None:
+        try:
+            import hyperscan  # type: ignore
+            db = hyperscan.Database()
+            db.compile(expressions=[rb"\x89PNG\r\n\x1a\n"], ids=[0], elements=1, flags=[0])
+            _PNG_DB = db
+        except Exception:
+            _PNG_DB = False
+    return _PNG_DB or None
+
+def _scan_magic_offsets(mm, size: int):
+    """以 hyperscan 一次掃出所有 PNG 魔數起點；不可用或失敗時回傳 None。"""
+    db = _png_magic_db()
+    if db is None: return None
+    n = len(PNG_MAGIC)
+    offsets = []
+    def on_match(_id, _from, to, _flags, base):
+        s = base + to - n
+        if not offsets or s > offsets[-1]: offsets.append(s)
+    try:
+        with memoryview(mm) as mv:
+            for w in range(0, size, HS_WINDOW):
+                # 視窗間重疊 n-1 位元組，避免漏掉跨界的魔數
+                with mv[w:w + HS_WINDOW + n - 1] as part:
+                    db.scan(part, match_event_handler=on_match, context=w)
+    except Exception:
+        return None
+    return offsets
+
 def bytescan_pngs(file_path: Path):
     imgs, errs = [], []
     try:
@@ -41,34 +107,60 @@ def bytescan_pngs(file_path: Path):
         with open(file_path, "rb") as f:
             mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
             try:
-                search_pos = 0
+                # 只會由前往後讀：請核心積極預讀，並可提早回收已讀過的頁
+                _madvise(mm, "MADV_SEQUENTIAL", "MADV_WILLNEED")
+                # 熱迴圈內改用區域變數，省去全域/屬性查找
+                _find = mm.find; _magic = PNG_MAGIC; _len_magic = 8
                 base = file_path.stem
                 idx = 0
-                while True:
-                    start = mm.find(PNG_MAGIC, search_pos)
-                    if start == -1: break
-                    pos = start + len(PNG_MAGIC)
+                def emit(start: int, end: int):
+                    # 只記錄位置，不複製整張 PNG；內容於預覽/匯出時再讀取
+                    nonlocal idx
+                    idx += 1
+                    label = f"{base}_{idx:03d}.png"
+                    w, h = sniff_png_size(mm[start:start+24])
+                    imgs.append(ImageBlob(file_path.name, str(file_path), label, w, h, start, end - start))
+
+                def take(start: int) -> int:
+                    """自 start 解析一張 PNG，回傳下一個搜尋位置。"""
+                    pos = start + _len_magic
+                    # 快速路徑：直接找 IEND，長度欄(0)與 CRC 都須與完整的 IEND chunk 相符
+                    # （資料內碰巧出現的 "IEND" 字樣不算），且中間不可再出現 PNG 魔數
+                    # （避免與下一張殘缺的 PNG 黏在一起）
+                    iend = _find(b"IEND", pos)
+                    if (iend != -1 and iend - 4 >= pos and iend + 8 <= size
+                            and mm[iend-4:iend+8] == IEND_CHUNK
+                            and _find(_magic, pos, iend) == -1):
+                        emit(start, iend + 8)
+                        return iend + 8
+                    # 不符合時退回逐 chunk 走訪
                     try:
                         while True:
                             if pos + 8 > size: raise ValueError("EOF @hdr")
-                            length = struct.unpack(">I", mm[pos:pos+4])[0]
+                            length = int.from_bytes(mm[pos:pos+4], "big")
                             ctype  = mm[pos+4:pos+8]; pos += 8
                             if pos + length + 4 > size: raise ValueError("EOF @data")
                             if ctype == b"IEND":
                                 pos += 4
-                                raw = bytes(mm[start:pos])
-                                idx += 1
-                                label = f"{base}_{idx:03d}.png"
-                                w, h = sniff_png_size(raw)
-                                imgs.append(ImageBlob(file_path.name, str(file_path), label, raw, w, h))
-                                search_pos = pos
-                                break
+                                emit(start, pos)
+                                return pos
                             else:
                                 pos += length + 4
                     except Exception as e:
                         errs.append(f"bytescan fail @{start}: {e}")
-                        search_pos = start + 1
-                        continue
+                        return start + 1
+
+                search_pos = 0
+                offsets = _scan_magic_offsets(mm, size)
+                if offsets is not None:
+                    for start in offsets:
+                        if start < search_pos: continue  # 落在上一張 PNG 內
+                        search_pos = take(start)
+                else:
+                    while True:
+                        start = _find(_magic, search_pos)
+                        if start == -1: break
+                        search_pos = take(start)
             finally:
                 mm.close()
     except Exception as e:
@@ -77,12 +169,10 @@ def bytescan_pngs(file_path: Path):
 
 def sniff_png_size(png_bytes: bytes) -> tuple[int,int]:
     try:
-        if not png_bytes.startswith(PNG_MAGIC): return 0,0
-        length = struct.unpack(">I", png_bytes[8:12])[0]
-        if png_bytes[12:16] != b"IHDR" or length != 13: return 0,0
-        w = struct.unpack(">I", png_bytes[16:20])[0]
-        h = struct.unpack(">I", png_bytes[20:24])[0]
-        return int(w), int(h)
+        # IHDR 長度由規格固定為 13，只需確認魔數與 chunk 類型，寬高一次解出
+        if png_bytes[:8] != PNG_MAGIC or png_bytes[12:16] != b"IHDR": return 0,0
+        w, h = struct.unpack(">II", png_bytes[16:24])
+        return w, h
     except Exception:
         return 0,0
 
@@ -104,91 +194,235 @@ def unitypy_textures(file_path: Path):
                 image = data.image
                 if image is None: continue
                 idx += 1
-                bio = io.BytesIO(); image.save(bio, format="PNG"); raw = bio.getvalue()
+                # zlib 等級 1：比預設等級 6 快數倍，檔案仍遠小於未壓縮的 RGBA
+                bio = io.BytesIO(); image.save(bio, format="PNG", compress_level=1); raw = bio.getvalue()
                 w, h = image.size
                 label = f"{base}_tex2d_{idx:03d}.png"
-                imgs.append(ImageBlob(file_path.name, str(file_path), label, raw, w, h))
+                imgs.append(ImageBlob(file_path.name, str(file_path), label, w, h, data=raw))
             except Exception as e:
                 errs.append(f"Texture2D export failed: {e}")
     except Exception as e:
         errs.append(f"UnityPy load failed: {e}")
     return imgs, errs
 
+# -------------------- 抽取：單檔入口（於子行程執行） --------------------
+def scan_file(file_path: Path, use_unitypy: bool):
+    imgs, errs = bytescan_pngs(file_path)
+    if not imgs and use_unitypy:
+        up_imgs, up_errs = unitypy_textures(file_path)
+        imgs += up_imgs; errs += up_errs
+    return imgs, errs
+
 # -------------------- 監看工作者 --------------------
 class WatchWorker(QtCore.QObject):
-    imageFound = QtCore.Signal(object)   # ImageBlob
+    imagesFound = QtCore.Signal(list)   # [(ImageBlob, 縮圖 QImage)]，每個檔案送一批
+    watchPaths  = QtCore.Signal(list)   # 需加入 QFileSystemWatcher 的資料夾/檔案
     fileLog    = QtCore.Signal(str)
     statMsg    = QtCore.Signal(str)
     finished   = QtCore.Signal()
     def __init__(self, root_dir: Path, recurse: bool, exts, min_size_bytes: int,
-                 use_unitypy: bool, stop_flag):
+                 use_unitypy: bool, stop_flag, thumb_px: int = 96):
         super().__init__()
         self.root_dir = root_dir
         self.recurse = recurse
-        self.exts = [e.lower() for e in exts] if exts else []
+        self.exts = tuple(e.lower() for e in exts) if exts else ()  # tuple 供 str.endswith 一次比對
         self.min_size_bytes = max(0, int(min_size_bytes))
         self.use_unitypy = bool(use_unitypy)
         self.stop_flag = stop_flag
-        self._seen = {}  # path -> (size, mtime)
+        self.thumb_px = int(thumb_px)  # 由 GUI 執行緒更新
+        self._seen = OrderedDict()  # 路徑 或 (dev, inode) -> (路徑, mtime_ns, size)，LRU 上限 _seen_max
+        self._seen_max = 50_000
+        self._watched_dirs = set()   # 已送交 GUI 監看的路徑；只送新的，避免每輪重送整棵樹
+        self._watched_files = set()
+        self._dirty = set()  # 變更通知累積的路徑（由 GUI 執行緒寫入）
+        self._recheck = set()  # 監看剛生效或需輪詢的路徑：只重新檢查，不當成監看已失效
+        self._poll = set()     # addPaths 失敗的路徑，每 POLL_SEC 重新檢查一次
+        self._dirty_lock = threading.Lock()
+        self._wake = threading.Event()
+        # 各檔案平行解析，預設為 CPU 核心數。一律用 spawn：在已有多條執行緒（GUI/監看/匯出）的
+        # 行程裡 fork 可能讓子行程卡在別的執行緒持有的鎖上；Windows 本來就是 spawn
+        self._pool = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+    def notify_changed(self, path: str):
+        """QFileSystemWatcher 的通知；以 DirectConnection 在 GUI 執行緒呼叫，只做記錄。"""
+        with self._dirty_lock: self._dirty.add(path)
+        self._wake.set()
+    def watch_added(self, added: list, failed: list):
+        """GUI 執行緒 addPaths 之後呼叫。列舉到加入監看之間的寫入不會有通知（資料夾監看不含
+        內容修改），所以監看生效後再檢查一次；失敗的路徑改為輪詢。"""
+        with self._dirty_lock:
+            self._recheck.update(added); self._recheck.update(failed); self._poll.update(failed)
+        self._wake.set()
     def run(self):
         try:
+            files, dirs = self._enumerate_files(self.root_dir, self.recurse)
+            if not self.recurse: dirs = []
+            self._watched_dirs.update(str(d) for d in dirs)
+            self.watchPaths.emit([str(self.root_dir)] + [str(d) for d in dirs])
+            self._scan_round(files)
+            self.statMsg.emit("監看中…")
+            # 之後只在收到變更通知時才動作；逾時只為定期檢查停止旗標
+            last_poll = time.monotonic()
             while not self.stop_flag.is_set():
-                files = self._enumerate_files()
-                for p in files:
-                    if self.stop_flag.is_set(): break
-                    try:
-                        st = p.stat(); key = str(p); sig = (st.st_size, st.st_mtime)
-                        if self._seen.get(key) == sig: continue
-                        self._seen[key] = sig
-                        self.statMsg.emit("監看中…")
-                        imgs, errs = bytescan_pngs(p)
-                        if not imgs and self.use_unitypy:
-                            up_imgs, up_errs = unitypy_textures(p)
-                            imgs += up_imgs; errs += up_errs
-                        for e in errs: self.fileLog.emit("⚠ " + e)
-                        if imgs:
-                            self.fileLog.emit(f"✅ {p.name} → 解析出 {len(imgs)} 張")
-                            for im in imgs: self.imageFound.emit(im)
-                        else:
-                            self.fileLog.emit(f"— {p.name} 沒有解析出圖片")
-                    except Exception as e:
-                        self.fileLog.emit(f"❌ {p.name}: {e}")
+                if self._wake.wait(SETTLE_SEC):
+                    self._sleep_intervals(SETTLE_SEC)
+                elif not self._poll or time.monotonic() - last_poll < POLL_SEC:
+                    continue
+                with self._dirty_lock:
+                    dirty, self._dirty = self._dirty, set()
+                    recheck, self._recheck = self._recheck, set()
+                    if time.monotonic() - last_poll >= POLL_SEC:
+                        recheck |= self._poll; last_poll = time.monotonic()
+                    self._wake.clear()
+                files, dirs = self._collect_changed(dirty, recheck)
+                if dirs: self.watchPaths.emit([str(d) for d in dirs])
+                self._scan_round(files)
                 self.statMsg.emit("監看中…")
-                self._sleep_intervals(SCAN_INTERVAL_SEC, check_every=10)
         finally:
+            self._pool.shutdown(wait=False, cancel_futures=True)
             self.finished.emit()
-    def _sleep_intervals(self, total_sec: float, check_every: int = 10):
-        slices = int(total_sec * check_every) or 1
-        step = total_sec / slices
-        for _ in range(slices):
+    def _scan_round(self, files):
+        """files: [(Path, stat)]；stat 來自列舉時，不再重複呼叫。"""
+        todo = []
+        for p, st in files:
+            # 內容一變 mtime/size 就不同，即為新鍵。Windows 的 DirEntry.stat 沒有 inode（為 0）但
+            # Path.stat 有，兩條路徑會對不上：依平台固定用路徑當鍵，而不是看 st_ino 是否為 0
+            # 值含路徑：檔案被改名/搬移時 inode 不變，但舊 ImageBlob 指向的路徑已失效，需重新解析
+            key = str(p) if _SEEN_BY_PATH else (st.st_dev, st.st_ino)
+            val = (str(p), st.st_mtime_ns, st.st_size)
+            if self._seen.get(key) == val:
+                self._seen.move_to_end(key); continue
+            self._seen[key] = val; self._seen.move_to_end(key)
+            if len(self._seen) > self._seen_max: self._seen.popitem(last=False)
+            todo.append(p)
+        # 檔案本身也要監看（就地改寫只會觸發 fileChanged）；只送尚未監看的
+        new = [key for key in (str(p) for p, _ in files) if key not in self._watched_files]
+        if new:
+            self._watched_files.update(new)
+            self.watchPaths.emit(new)
+        if not todo: return
+        self.statMsg.emit("監看中…")
+        futs = {self._pool.submit(scan_file, p, self.use_unitypy): p for p in todo}
+        for fut in as_completed(futs):
             if self.stop_flag.is_set(): break
-            time.sleep(step)
-    def _enumerate_files(self):
-        root = self.root_dir; res = []
-        it = root.rglob("*") if self.recurse else root.glob("*")
-        for p in it:
-            if not p.is_file(): continue
+            p = futs[fut]
             try:
-                if self.min_size_bytes > 0 and p.stat().st_size < self.min_size_bytes:
+                imgs, errs = fut.result()
+                for e in errs: self.fileLog.emit("⚠ " + e)
+                if imgs:
+                    self.fileLog.emit(f"✅ {p.name} → 解析出 {len(imgs)} 張")
+                    self.imagesFound.emit([(im, self._prepare(im)) for im in imgs])
+                else:
+                    self.fileLog.emit(f"— {p.name} 沒有解析出圖片")
+            except Exception as e:
+                self.fileLog.emit(f"❌ {p.name}: {e}")
+        for fut in futs: fut.cancel()
+    def _collect_changed(self, dirty, recheck=()):
+        """由變更通知（dirty）與重新檢查（recheck）的路徑整理出待檢查的檔案，以及新出現、需要監看的子資料夾。"""
+        files, new_dirs = [], []
+        for path in sorted(set(dirty) | set(recheck)):
+            p = Path(path)
+            if p.is_dir():
+                fs, ds = self._enumerate_files(p, False)
+                files += fs
+                for d in ds:
+                    if not self.recurse or str(d) in self._watched_dirs: continue
+                    sub_fs, sub_ds = self._enumerate_files(d, True)
+                    files += sub_fs; new_dirs += [d] + sub_ds
+            elif p.exists():
+                # fileChanged 也會在檔案被刪除/取代時發出，此時 Qt 已移除監看；重新送交（重複加入無害）
+                if path in dirty: self._watched_files.discard(path)
+                try:
+                    st = self._check(p.name, p)
+                    if st is not None: files.append((p, st))
+                except OSError:
                     continue
-            except Exception:
-                continue
-            if p.suffix.lower() == ".png": continue
-            if self.exts:
-                if p.suffix.lower() in self.exts: res.append(p)
             else:
-                res.append(p)
-        return res
+                # 已刪除；QFileSystemWatcher 會自動移除
+                self._watched_dirs.discard(path); self._watched_files.discard(path); self._poll.discard(path)
+        self._watched_dirs.update(str(d) for d in new_dirs)
+        return files, new_dirs
+    def _prepare(self, img: ImageBlob) -> QtGui.QImage:
+        # 內容只讀一次：在工作者執行緒算出去重雜湊並完成 PNG 解碼與縮放，GUI 只需轉成 QPixmap
+        raw = img.png_bytes
+        if raw: img.digest = hashlib.blake2b(raw, digest_size=16).digest()
+        qi = QtGui.QImage(); qi.loadFromData(raw, "PNG")
+        if qi.isNull(): return qi
+        t = self.thumb_px
+        # 小圖示用最近鄰即可，肉眼難以分辨；較大縮圖才做平滑縮放
+        mode = QtCore.Qt.FastTransformation if t <= 128 else QtCore.Qt.SmoothTransformation
+        return qi.scaled(t, t, QtCore.Qt.KeepAspectRatio, mode)
+    def _sleep_intervals(self, total_sec: float):
+        # 停止旗標一旦設定，wait 會立即返回
+        self.stop_flag.wait(total_sec)
+    def _enumerate_files(self, root: Path, recurse: bool):
+        """以 os.scandir 深度優先走訪，回傳 ([(檔案, stat)], 走訪到的子資料夾)。
+        DirEntry 的檔案類型取自目錄讀取本身，只有通過副檔名篩選的檔案才需要 stat。"""
+        files, dirs = [], []
+        stack = [str(root)]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    for e in it:
+                        try:
+                            if e.is_dir(follow_symlinks=False):
+                                dirs.append(Path(e.path))
+                                if recurse: stack.append(e.path)
+                            elif e.is_file():
+                                st = self._check(e.name, e)
+                                if st is not None: files.append((Path(e.path), st))
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+        return files, dirs
+    def _check(self, name: str, entry):
+        """篩選檔名與大小；entry 可為 DirEntry 或 Path。符合時回傳其 stat，否則 None。"""
+        name_lower = name.lower()
+        if name_lower.endswith(".png"): return None
+        if self.exts and not name_lower.endswith(self.exts): return None
+        st = entry.stat()
+        if st.st_size < self.min_size_bytes: return None
+        return st
 
 # -------------------- 自訂 Delegate：縮圖右側/下方自動排版（右側改為多行換行填滿） --------------------
 class ThumbTextDelegate(QtWidgets.QStyledItemDelegate):
     GAP = 8
     PAD = 8
+    STATIC_CACHE_MAX = 2048
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._static_cache: dict[tuple, QtGui.QStaticText] = {}  # (文字, 寬度, 置中) -> 排版結果
+        self._style = None  # 第一次繪製時取得後沿用
+    def clear_text_cache(self):
+        self._static_cache.clear()
+    def _static_text(self, text: str, width: int, center: bool, font: QtGui.QFont) -> QtGui.QStaticText:
+        # 換行排版只做一次；之後每次重繪（捲動/縮放）直接貼上
+        key = (text, width, center)
+        st = self._static_cache.get(key)
+        if st is None:
+            if len(self._static_cache) >= self.STATIC_CACHE_MAX: self._static_cache.clear()
+            st = QtGui.QStaticText(text)
+            st.setTextFormat(QtCore.Qt.PlainText)
+            st.setTextWidth(width)
+            to = QtGui.QTextOption(QtCore.Qt.AlignHCenter if center else QtCore.Qt.AlignLeft)
+            to.setWrapMode(QtGui.QTextOption.WordWrap)
+            st.setTextOption(to)
+            st.prepare(QtGui.QTransform(), font)
+            self._static_cache[key] = st
+        return st
+    def _draw_text(self, painter: QtGui.QPainter, rect: QtCore.QRect, st: QtGui.QStaticText, font: QtGui.QFont):
+        painter.save()
+        painter.setFont(font); painter.setClipRect(rect)
+        painter.drawStaticText(rect.topLeft(), st)
+        painter.restore()
     def paint(self, painter: QtGui.QPainter, option: QtWidgets.QStyleOptionViewItem, index: QtCore.QModelIndex):
         opt = QtWidgets.QStyleOptionViewItem(option)
         self.initStyleOption(opt, index)
-        style = opt.widget.style() if opt.widget else QtWidgets.QApplication.style()
-        style.drawPrimitive(QtWidgets.QStyle.PE_PanelItemViewItem, opt, painter, opt.widget)
+        style = self._style or (opt.widget.style() if opt.widget else QtWidgets.QApplication.style())
+        self._style = style
+        # 一般狀態的底色由 view 自己畫；只有選取/滑過時才需要畫項目面板
+        if opt.state & (QtWidgets.QStyle.State_Selected | QtWidgets.QStyle.State_MouseOver):
+            style.drawPrimitive(QtWidgets.QStyle.PE_PanelItemViewItem, opt, painter, opt.widget)
 
         icon = opt.icon
         text = opt.text or ""
@@ -213,12 +447,12 @@ class ThumbTextDelegate(QtWidgets.QStyledItemDelegate):
             # 右側文字：改成「多行換行」佔滿整個右側高度（盡量填滿紅框區）
             tx = icon_rect.right() + self.GAP
             text_rect = QtCore.QRect(tx, r.top(), r.right() - tx, ih)
-            painter.drawText(text_rect, QtCore.Qt.AlignLeft | QtCore.Qt.AlignTop | QtCore.Qt.TextWordWrap, text)
+            self._draw_text(painter, text_rect, self._static_text(text, text_rect.width(), False, opt.font), opt.font)
         else:
             # 下方單行/兩行
             ty = icon_rect.bottom() + self.GAP
             text_rect = QtCore.QRect(r.left(), ty, r.width(), fm.height() * 2)
-            painter.drawText(text_rect, QtCore.Qt.AlignTop | QtCore.Qt.AlignHCenter | QtCore.Qt.TextWordWrap, text)
+            self._draw_text(painter, text_rect, self._static_text(text, text_rect.width(), True, opt.font), opt.font)
 
     def sizeHint(self, option: QtWidgets.QStyleOptionViewItem, index: QtCore.QModelIndex):
         view = option.widget
@@ -242,7 +476,8 @@ class ThumbListWidget(QtWidgets.QListWidget):
         self.setWrapping(False)
         self.setMovement(QtWidgets.QListView.Static)
         self.setSpacing(6)
-        self.setItemDelegate(ThumbTextDelegate())
+        self._delegate = ThumbTextDelegate(self)
+        self.setItemDelegate(self._delegate)
         self.updateMetrics()
 
     def setThumb(self, s: int):
@@ -250,6 +485,7 @@ class ThumbListWidget(QtWidgets.QListWidget):
         self.updateMetrics()
 
     def updateMetrics(self):
+        self._delegate.clear_text_cache()  # 寬度/模式可能改變，排版快取作廢
         iw = ih = self._thumb
         self.setIconSize(QtCore.QSize(iw, ih))
         available_text = max(0, self.viewport().width() - (iw + ThumbTextDelegate.GAP + ThumbTextDelegate.PAD * 2))
@@ -298,6 +534,8 @@ class ImagePreview(QtWidgets.QGraphicsView):
         super().__init__(parent)
         self.setScene(QtWidgets.QGraphicsScene(self))
         self._item = None
+        self._png = b""          # 目前預覽的原始位元組（放大超過解碼解析度時重新解碼）
+        self._full_res = True
         self._hud = QtWidgets.QLabel(self)
         self._hud.setText("")
         self._hud.setAlignment(QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter)
@@ -314,7 +552,7 @@ class ImagePreview(QtWidgets.QGraphicsView):
         self._min_zoom, self._max_zoom = 0.05, 50.0
         self._hud_margin = 8
     def clear_image(self, text="尚無預覽"):
-        self.scene().clear(); self._item = None
+        self.scene().clear(); self._item = None; self._png = b""
         self._empty = QtWidgets.QGraphicsTextItem(text)
         self._empty.setDefaultTextColor(QtGui.QColor("#AAAAAA"))
         f = QtGui.QFont(); f.setPointSize(14); self._empty.setFont(f)
@@ -322,17 +560,41 @@ class ImagePreview(QtWidgets.QGraphicsView):
         self.resetTransform()
         self._hud.hide()
     def set_image_bytes(self, png_bytes: bytes):
-        pix = QtGui.QPixmap()
-        if not pix.loadFromData(png_bytes, "PNG"):
+        img, native = self._decode(png_bytes, full=False)
+        if img.isNull():
             self.clear_image("預覽失敗"); return
         self.scene().clear()
-        self._item = self.scene().addPixmap(pix)
-        self.scene().setSceneRect(self._item.boundingRect())
+        self._png = png_bytes
+        self._full_res = img.size() == native
+        self._item = self.scene().addPixmap(QtGui.QPixmap.fromImage(img))
+        # 場景座標維持原始尺寸：縮小解碼時把 item 放大回去，1x 仍代表原始像素
+        self._item.setScale(native.width() / img.width())
+        self.scene().setSceneRect(self._item.sceneBoundingRect())
         self._fit()
+    def _decode(self, data: bytes, full: bool):
+        """以 QImageReader 解碼；非 full 時直接解成約兩倍視窗大小，不產生原尺寸影像。"""
+        buf = QtCore.QBuffer(); buf.setData(QtCore.QByteArray(data)); buf.open(QtCore.QIODevice.ReadOnly)
+        reader = QtGui.QImageReader(buf, b"PNG")
+        reader.setAutoTransform(True)
+        size = reader.size()
+        if not full and size.isValid() and not size.isEmpty():
+            vp = self.viewport().size()
+            scale = min(1.0, max(vp.width() / size.width(), vp.height() / size.height()) * 2)
+            if scale < 1.0: reader.setScaledSize(size * scale)
+        img = reader.read()
+        return img, (size if size.isValid() else img.size())
+    def _ensure_full_res(self):
+        # 放大到超過目前解碼解析度時，才改用原尺寸
+        if self._full_res or not self._item: return
+        if self.transform().m11() * self._item.scale() <= 1.0: return
+        img, _ = self._decode(self._png, full=True)
+        if img.isNull(): return
+        self._full_res = True
+        self._item.setPixmap(QtGui.QPixmap.fromImage(img)); self._item.setScale(1.0)
     def _fit(self):
         if not self._item: return
         self.resetTransform()
-        br = self._item.boundingRect()
+        br = self._item.sceneBoundingRect()
         if not br.isEmpty():
             self.fitInView(br.marginsAdded(QtCore.QMarginsF(4,4,4,4)), QtCore.Qt.KeepAspectRatio)
         self._reposition_hud()
@@ -343,12 +605,12 @@ class ImagePreview(QtWidgets.QGraphicsView):
         target = cur * factor
         if target < self._min_zoom: factor = self._min_zoom / cur
         elif target > self._max_zoom: factor = self._max_zoom / cur
-        self.scale(factor, factor); self._reposition_hud()
+        self.scale(factor, factor); self._ensure_full_res(); self._reposition_hud()
     def mouseDoubleClickEvent(self, e: QtGui.QMouseEvent):
         if e.button() == QtCore.Qt.LeftButton:
             cur = self.transform().m11()
             if abs(cur - 1.0) < 0.05: self._fit()
-            else: self.resetTransform(); self._reposition_hud()
+            else: self.resetTransform(); self._ensure_full_res(); self._reposition_hud()
         else:
             super().mouseDoubleClickEvent(e)
     def resizeEvent(self, e):
@@ -372,10 +634,10 @@ class LivePreviewWindow(QtWidgets.QWidget):
         self.setWindowTitle("MSW碎片檢查工具 MSW Fragment Viewer v1.0.0")
         self.setFixedSize(1600, 900)
 
-        import threading
         self.stop_flag = threading.Event()
-        self.images: list[ImageBlob] = []
         self.max_cache = 500
+        self.images: deque[ImageBlob] = deque(maxlen=self.max_cache)  # 超過上限時自動自尾端淘汰
+        self._dedup: dict[bytes, ImageBlob] = {}  # digest -> 快取中的圖片
         self.auto_preview_latest = True
 
         # ---- 上方控制列 ----
@@ -491,11 +753,13 @@ class LivePreviewWindow(QtWidgets.QWidget):
 
         self.thread = None
         self.worker = None
+        self.fs_watcher = None
 
     # ---- 縮圖尺寸控制 ----
     def _on_thumb_changed(self, v: int):
         self.list.setThumb(v)
         self.thumb_lbl.setText(f"縮圖：{v}px")
+        if self.worker: self.worker.thumb_px = self.list._thumb
 
     # -------- 控制邏輯 --------
     def start_watch(self):
@@ -517,13 +781,19 @@ class LivePreviewWindow(QtWidgets.QWidget):
             exts=exts,
             min_size_bytes=min_size_bytes,
             use_unitypy=self.use_unitypy_chk.isChecked(),
-            stop_flag=self.stop_flag
+            stop_flag=self.stop_flag,
+            thumb_px=self.list._thumb
         )
         self.worker.moveToThread(self.thread)
-        self.worker.imageFound.connect(self.on_image_found)
+        self.worker.imagesFound.connect(self.on_images_found)
         self.worker.fileLog.connect(self.append_log)
         self.worker.statMsg.connect(self.set_status)
         self.worker.finished.connect(self.on_worker_done)
+        # 以作業系統的變更通知取代輪詢；DirectConnection 讓通知不必排入忙碌中的工作者執行緒
+        self.fs_watcher = QtCore.QFileSystemWatcher(self)
+        self.fs_watcher.directoryChanged.connect(self.worker.notify_changed, QtCore.Qt.DirectConnection)
+        self.fs_watcher.fileChanged.connect(self.worker.notify_changed, QtCore.Qt.DirectConnection)
+        self.worker.watchPaths.connect(self.add_watch_paths)
         self.thread.started.connect(self.worker.run)
         self.thread.start()
 
@@ -536,8 +806,20 @@ class LivePreviewWindow(QtWidgets.QWidget):
         if self.thread:
             self.thread.quit(); self.thread.wait()
         self.thread = None; self.worker = None
+        if self.fs_watcher:
+            self.fs_watcher.deleteLater(); self.fs_watcher = None
         self.set_status("已停止")
 
+    @QtCore.Slot(list)
+    def add_watch_paths(self, paths: list):
+        # 工作者只送尚未監看的路徑；addPaths 回傳加入失敗者（例如 inotify 監看數已達上限）
+        if not (self.fs_watcher and self.worker and paths): return
+        failed = self.fs_watcher.addPaths(paths)
+        if failed:
+            self.append_log(f"⚠ 無法監看 {len(failed)} 個路徑，改為每 {POLL_SEC:g} 秒輪詢（例如 {failed[0]}）")
+        bad = set(failed)
+        self.worker.watch_added([p for p in paths if p not in bad], failed)
+
     def set_running(self, running: bool):
         self.start_btn.setEnabled(not running)
         self.stop_btn.setEnabled(running)
@@ -550,24 +832,54 @@ class LivePreviewWindow(QtWidgets.QWidget):
         else:       self.progress.setOverlayText("")
 
     # -------- 預覽 & 清單 --------
-    @QtCore.Slot(object)
-    def on_image_found(self, img: ImageBlob):
+    @QtCore.Slot(list)
+    def on_images_found(self, batch: list):
+        # 整批加入期間暫停重繪，結束後只更新一次
+        self.list.setUpdatesEnabled(False)
+        added = 0
+        try:
+            for img, thumb in batch: added += self._add_image(img, thumb)
+        finally:
+            self.list.setUpdatesEnabled(True)
+            self.list.viewport().update()
+        if len(batch) > added:
+            self.append_log(f"↺ 略過 {len(batch) - added} 張與快取相同的圖片")
+        if added and self.auto_preview_latest:
+            self.list.setCurrentRow(0)
+
+    def _add_image(self, img: ImageBlob, thumb: QtGui.QImage) -> bool:
+        # 內容相同的圖（多個檔案共用的素材、或檔案改寫後重掃）只保留一份
+        prev = self._dedup.get(img.digest) if img.digest else None
+        if prev is not None:
+            # 舊的讀取位置可能已被改寫，改指向最新出現處（來源檔名與標籤一起換，清單/預覽/匯出路徑才一致）
+            if prev.data is None and img.data is None:
+                prev.source_file, prev.source_path, prev.label = img.source_file, img.source_path, img.label
+                prev.offset, prev.length = img.offset, img.length
+                # 依身分找列（deque.index 會用 dataclass __eq__ 逐欄比較）
+                row = next(i for i, im in enumerate(self.images) if im is prev)
+                item = self.list.item(row)
+                if item is not None:
+                    item.setText(self._item_text(prev))
+                    if self.list.currentItem() is item: self.show_selected(self.list.currentRow())
+            return False
+        # 快取已滿時 deque 會淘汰尾端最舊的一張，清單同步移除
+        if len(self.images) == self.images.maxlen:
+            old = self.images[-1]
+            if self._dedup.get(old.digest) is old: del self._dedup[old.digest]
+            if self.list.count(): self.list.takeItem(self.list.count()-1)
         # 最新加入頂部（index 0），清單也插入在最上面
-        self.images.insert(0, img)
-        # 控制快取大小（從尾端移除舊的）
-        if len(self.images) > self.max_cache:
-            drop = len(self.images) - self.max_cache
-            del self.images[-drop:]
-            for _ in range(min(drop, self.list.count())):
-                self.list.takeItem(self.list.count()-1)
-
-        item = QtWidgets.QListWidgetItem(f"{img.label}  [{img.width}x{img.height}]  <{Path(img.source_path).name}>")
-        pm = img.qpixmap().scaled(self.list._thumb, self.list._thumb, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+        self.images.appendleft(img)
+        if img.digest: self._dedup[img.digest] = img
+
+        item = QtWidgets.QListWidgetItem(self._item_text(img))
+        pm = QtGui.QPixmap.fromImage(thumb)
         item.setIcon(QtGui.QIcon(pm))
         self.list.insertItem(0, item)
+        return True
 
-        if self.auto_preview_latest:
-            self.list.setCurrentRow(0)
+    @staticmethod
+    def _item_text(img: ImageBlob) -> str:
+        return f"{img.label}  [{img.width}x{img.height}]  <{Path(img.source_path).name}>"
 
     def show_selected(self, row: int):
         if row < 0 or row >= len(self.images):
@@ -580,10 +892,15 @@ class LivePreviewWindow(QtWidgets.QWidget):
         super().resizeEvent(ev); self.show_selected(self.list.currentRow())
 
     def _set_auto_preview(self, checked: bool): self.auto_preview_latest = checked
-    def _set_max_cache(self, v: int): self.max_cache = v
+    def _set_max_cache(self, v: int):
+        self.max_cache = v
+        self.images = deque(islice(self.images, v), maxlen=v)  # 保留最新的 v 張
+        self._dedup = {im.digest: im for im in self.images if im.digest}
+        while self.list.count() > len(self.images):
+            self.list.takeItem(self.list.count()-1)
 
     def clear_cache(self):
-        self.images.clear(); self.list.clear(); self.preview.clear_image("尚無預覽"); self.preview.set_overlay_text("")
+        self.images.clear(); self._dedup.clear(); self.list.clear(); self.preview.clear_image("尚無預覽"); self.preview.set_overlay_text("")
         self.append_log("🧹 已清空快取")
 
     # -------- 匯出 --------
@@ -610,32 +927,55 @@ class LivePreviewWindow(QtWidgets.QWidget):
             rows = [self.list.currentRow()]
         if not rows:
             QtWidgets.QMessageBox.information(self, "提示", "尚未選取任何圖片。"); return
-        cnt = 0
-        for r in rows:
-            if r < 0 or r >= len(self.images): continue
-            img = self.images[r]; sub = outdir
-            if self.group_chk.isChecked():
-                sub = outdir / Path(img.source_file).stem; sub.mkdir(parents=True, exist_ok=True)
-            try:
-                with open(sub / img.label, "wb") as f: f.write(img.png_bytes)
-                cnt += 1
-            except Exception as e:
-                self.append_log(f"❌ 匯出失敗 {img.label}: {e}")
+        cnt = self._export_blobs([self.images[r] for r in rows if 0 <= r < len(self.images)], outdir)
         QtWidgets.QMessageBox.information(self, "完成", f"已匯出 {cnt} 張。")
     def export_all(self):
         outdir = self._ensure_out_dir()
         if outdir is None: return
-        cnt = 0
-        for img in self.images:
-            sub = outdir
-            if self.group_chk.isChecked():
-                sub = outdir / Path(img.source_file).stem; sub.mkdir(parents=True, exist_ok=True)
-            try:
-                with open(sub / img.label, "wb") as f: f.write(img.png_bytes)
-                cnt += 1
-            except Exception as e:
-                self.append_log(f"❌ 匯出失敗 {img.label}: {e}")
+        cnt = self._export_blobs(list(self.images), outdir)
         QtWidgets.QMessageBox.information(self, "完成", f"已匯出 {cnt} 張（目前快取）。")
+    def _export_blobs(self, imgs: list, outdir: Path) -> int:
+        # 子資料夾先一次建好；讀取/編碼/寫檔交給背景執行緒，GUI 只更新進度
+        # 同名標籤（檔案改寫後重掃、不同資料夾的同名來源、或未分組）依清單順序加上 _2、_3…，
+        # 確保每個目標路徑只由一個執行緒寫入，結果與順序無關
+        jobs, used = [], set()
+        for img in imgs:
+            sub = outdir / Path(img.source_file).stem if self.group_chk.isChecked() else outdir
+            target = sub / img.label; n = 1
+            while os.path.normcase(str(target)) in used:
+                n += 1; target = sub / f"{Path(img.label).stem}_{n}{Path(img.label).suffix}"
+            used.add(os.path.normcase(str(target)))
+            jobs.append((img, target))
+        for sub in {target.parent for _, target in jobs}:
+            try: sub.mkdir(parents=True, exist_ok=True)
+            except Exception: pass  # 寫檔時會再失敗並記錄
+        buttons = (self.export_sel_btn, self.export_all_btn, self.clear_btn)
+        for b in buttons: b.setEnabled(False)
+        self.progress.setRange(0, max(1, len(jobs))); self.progress.setValue(0)
+        self.progress.setVisible(True); self.progress.setOverlayText("匯出中…")
+        cnt = 0
+        try:
+            with ThreadPoolExecutor(max_workers=4) as ex:
+                futs = {ex.submit(self._write_blob, img, target): img for img, target in jobs}
+                for i, fut in enumerate(as_completed(futs), 1):
+                    try:
+                        fut.result(); cnt += 1
+                    except Exception as e:
+                        self.append_log(f"❌ 匯出失敗 {futs[fut].label}: {e}")
+                    self.progress.setValue(i)
+                    QtWidgets.QApplication.processEvents()
+        finally:
+            # 還原為監看狀態的忙碌指示
+            running = self.thread is not None
+            self.progress.setRange(0, 0); self.progress.setVisible(running)
+            self.progress.setOverlayText("監看中…" if running else "")
+            for b in buttons: b.setEnabled(True)
+        return cnt
+    @staticmethod
+    def _write_blob(img: ImageBlob, target: Path):
+        data = img.png_bytes
+        if not data: raise OSError("來源檔已變更或移除")
+        target.write_bytes(data)
 
     # -------- 狀態（顯示在進度條中央） --------
     @QtCore.Slot(str)
@@ -659,6 +999,7 @@ def main():
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # 打包成 EXE 時，子行程需由此分流
     try:
         main()
     except Exception: